@@ -16,15 +16,19 @@ import sys
 import argparse
 import time
 import logging
+import logging.handlers
+import queue
+import atexit
 import json
 import zipfile
 import io
-import subprocess
-import re
-import uuid
-
-import boto3
-from botocore.exceptions import ClientError
+import os
+import tempfile
+import random
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, asdict, make_dataclass
 
 can_cognito_json = {
             "Version": "2012-10-17",
@@ -71,6 +75,37 @@ can_gamelift_session_control_policy_json = {
         ]
     }
 
+# the policies above never change, so serialize them once, compactly
+can_cognito_policy_document = json.dumps(
+    can_cognito_json, separators=(',', ':'))
+can_execute_lambda_policy_document = json.dumps(
+    can_execute_lambda_policy_json, separators=(',', ':'))
+can_gamelift_session_control_policy_document = json.dumps(
+    can_gamelift_session_control_policy_json, separators=(',', ':'))
+
+# shared by every client. adaptive retries add client-side rate limiting on
+# top of exponential backoff, and the larger pool keeps the thread pools
+# used below from queueing on connections. botocore, like boto3, is only
+# imported by code that talks to AWS, so --help and --dry_run don't load it.
+@functools.lru_cache(maxsize=1)
+def make_client_config():
+    from botocore.config import Config
+    return Config(
+        retries={'mode': 'adaptive', 'max_attempts': 10},
+        max_pool_connections=50,
+        tcp_keepalive=True)
+
+
+# build zips are large, so upload them as 8MB parts on 10 threads
+@functools.lru_cache(maxsize=1)
+def make_build_transfer_config():
+    from boto3.s3.transfer import TransferConfig
+    return TransferConfig(
+        multipart_threshold=8 * 1024 * 1024,
+        multipart_chunksize=8 * 1024 * 1024,
+        max_concurrency=10,
+        use_threads=True)
+
 logger = logging.getLogger(__name__)
 
 log_debug = logger.debug    # detailed information
@@ -81,88 +116,245 @@ log_exception = logger.exception    # level is ERROR. log the exception too
 log_critical = logger.critical      # program failed
 
 
+# jittered exponential backoff for polling and retries: roughly 1, 1.6, 2.6,
+# 4.1, ... seconds, capped at 30
+def backoff_delays(initial=1, factor=1.6, cap=30):
+    delay = initial
+    while True:
+        yield delay + random.random() * 0.2
+        delay = min(delay * factor, cap)
+
+
+# random hex ids for lambda add_permission statements. one os.urandom() read
+# is sliced into 16 ids instead of reading urandom for every id.
+statement_id_bytes = b""
+statement_id_lock = threading.Lock()
+
+
+def next_statement_id():
+    global statement_id_bytes
+    with statement_id_lock:
+        if not statement_id_bytes:
+            statement_id_bytes = os.urandom(16 * 16)
+        statement_id = statement_id_bytes[:16]
+        statement_id_bytes = statement_id_bytes[16:]
+    return statement_id.hex()
+
+
+# quote a string as a jmespath raw string literal for paginator searches
+def jmespath_literal(value):
+    return "'" + value.replace("'", "\\'") + "'"
+
+
+# memoize an AwsBackend._lookup_* method on the instance, keyed on its arguments.
+# the create_* and delete_* methods call _clear_lookup() after they mutate the
+# resource so later lookups in the same run see the change.
+# lookups run from worker threads too, so a per-key lock (checked again once
+# held) makes concurrent callers share one request instead of racing.
+def cached_lookup(lookup):
+    @functools.wraps(lookup)
+    def wrapper(self, *args):
+        key = (lookup.__name__,) + args
+        try:
+            return self._lookup_cache[key]
+        except KeyError:
+            pass
+        with self._lookup_locks.setdefault(key, threading.Lock()):
+            try:
+                return self._lookup_cache[key]
+            except KeyError:
+                pass
+            value = lookup(self, *args)
+            self._lookup_cache[key] = value
+            return value
+    return wrapper
+
+
+# everything needed to create one lambda and its role. the handler is read
+# from filename with replace_old substituted by replace_new.
+@dataclass
+class LambdaSpec:
+    role_name: str
+    other_policy_name: str
+    other_policy_document: str
+    function_name: str
+    filename: str
+    replace_old: str = None
+    replace_new: str = None
+
+
+# raw bytes of a lambda handler source file. cached because every lambda
+# built from the same template would otherwise re-read it.
+@functools.lru_cache(maxsize=8)
+def read_handler_template(filename):
+    with open(filename, 'rb') as inputfile:
+        return inputfile.read()
+
+
+# the handler is a few KB so store it uncompressed rather than spend time
+# deflating it. getvalue() hands back the buffer's bytes without copying
+# them, and the buffer is released as soon as this returns. botocore only
+# accepts bytes/bytearray/file-like for ZipFile, so a memoryview won't do.
+def zip_lambda_handler(filedata):
+    '''returns the bytes of a zip holding filedata as handler.py'''
+    zip_buffer = io.BytesIO()
+    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_STORED) as tempzip:
+        tempzip.writestr('handler.py', filedata)
+    return zip_buffer.getvalue()
+
+
 class AwsBackend:
-    def __init__(self, backend_config):
+    def __init__(self, backend_config, session):
         log_info("initializing boto api interfaces")
-        self.session = boto3.Session(
-                profile_name=backend_config["profile_name"],
-                region_name=backend_config["region_name"])
-        self.iam_client = self.session.client('iam')
-        self.gamelift_client = self.session.client('gamelift')
-        self.cognitoidp_client = self.session.client('cognito-idp')
-        self.lambda_client = self.session.client('lambda')
-        self.apigateway_client = self.session.client('apigateway')
-        self.sts_client = self.session.client('sts')
+        self.session = session
+        client_config = make_client_config()
+        self.iam_client = self.session.client('iam', config=client_config)
+        self.gamelift_client = self.session.client('gamelift', config=client_config)
+        self.cognitoidp_client = self.session.client('cognito-idp', config=client_config)
+        self.lambda_client = self.session.client('lambda', config=client_config)
+        self.apigateway_client = self.session.client('apigateway', config=client_config)
+        self.sts_client = self.session.client('sts', config=client_config)
         self.backend_config = backend_config
-
+        self._lookup_cache = {}
+        self._lookup_locks = {}
+        self._role_arns = None
+        self._role_arns_denied = False
+        self._role_arns_lock = threading.Lock()
+
+    # lambdas are created and deleted on separate threads, which can both
+    # clear the same key, so don't assume the key is still there
+    def _clear_lookup(self, *lookup_names):
+        for key in list(self._lookup_cache):
+            if key[0] in lookup_names:
+                self._lookup_cache.pop(key, None)
+
+    # record what a lookup would now return, for resources this run just created
+    def _remember_lookup(self, value, lookup_name, *args):
+        self._lookup_cache[(lookup_name,) + args] = value
+
+    @cached_lookup
+    def _lookup_account_id(self):
+        return self.sts_client.get_caller_identity()["Account"]
+
+    @cached_lookup
     def _lookup_build_id(self, build_name):
-        list_builds_response = self.gamelift_client.list_builds()
-        builds = list_builds_response["Builds"]
-        for build in builds:
-            if build["Name"] == build_name:
-                return build["BuildId"]
-        return None
-
+        paginator = self.gamelift_client.get_paginator('list_builds')
+        return next(
+            paginator.paginate().search(
+                f"Builds[?Name=={jmespath_literal(build_name)}].BuildId"),
+            None)
+
+    # does what `aws gamelift upload-build` does, but in-process with the
+    # existing session: zip the build root, register the build with gamelift
+    # and upload the zip to the S3 location gamelift hands back.
     def create_build(self):
-        log_info(f'creating {self.backend_config["build_root"]}')
-
-        command_list = ["aws",
-                    "gamelift", "upload-build",
-                    "--operating-system", self.backend_config["build_os"],
-                    "--build-root", self.backend_config["build_root"],
-                    "--name", self.backend_config["build_name"],
-                    "--build-version", self.backend_config["build_version"],
-                    "--region", self.backend_config["region_name"],
-                    "--profile", self.backend_config["profile_name"]]
-        log_info(' '.join(command_list))
-
-        completed_process = subprocess.run(command_list, capture_output=True)
-
-        match = re.search(
-            "Build ID: (.*)",
-            completed_process.stdout.decode('utf-8'))
-        if match:
-            build_id = match.group(1)
-            log_info("successfully uploaded build ID: " + build_id)
-        else:
-            log_error("failed")
-            log_error(completed_process.stderr.decode('utf-8'))
+        '''returns the id of the uploaded build, or None on failure'''
+        from boto3.exceptions import S3UploadFailedError
+        from botocore.exceptions import ClientError
+        build_root = self.backend_config.build_root
+        log_info(f'creating {build_root}')
+
+        if not os.path.isdir(build_root):
+            log_error(f"build_root is not a directory: {build_root}")
+            return None
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            zip_path = os.path.join(temp_dir, "build.zip")
+            log_info(f"zipping {build_root}")
+            with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as build_zip:
+                for dir_path, _, file_names in os.walk(build_root):
+                    for file_name in file_names:
+                        file_path = os.path.join(dir_path, file_name)
+                        build_zip.write(
+                            file_path,
+                            os.path.relpath(file_path, build_root))
+
+            try:
+                create_build_resp = self.gamelift_client.create_build(
+                    Name=self.backend_config.build_name,
+                    Version=self.backend_config.build_version,
+                    OperatingSystem=self.backend_config.build_os)
+            except ClientError:
+                log_exception(
+                    f'Could not create build {self.backend_config.build_name}.')
+                return None
+            build_id = create_build_resp["Build"]["BuildId"]
+            self._clear_lookup("_lookup_build_id")
+
+            # the upload credentials are scoped to the build's storage location
+            upload_credentials = create_build_resp["UploadCredentials"]
+            storage_location = create_build_resp["StorageLocation"]
+            s3_client = self.session.client(
+                's3',
+                config=make_client_config(),
+                aws_access_key_id=upload_credentials["AccessKeyId"],
+                aws_secret_access_key=upload_credentials["SecretAccessKey"],
+                aws_session_token=upload_credentials["SessionToken"])
+
+            log_info(f"uploading build {build_id}")
+            try:
+                s3_client.upload_file(
+                    zip_path,
+                    storage_location["Bucket"],
+                    storage_location["Key"],
+                    Config=make_build_transfer_config())
+            except (ClientError, S3UploadFailedError):
+                log_exception(f"Could not upload build {build_id}.")
+                return None
+
+        log_info("successfully uploaded build ID: " + build_id)
+        return build_id
+
+    # every build with the name, not just the first one
+    def _lookup_build_ids(self, build_name):
+        paginator = self.gamelift_client.get_paginator('list_builds')
+        return list(paginator.paginate().search(
+            f"Builds[?Name=={jmespath_literal(build_name)}].BuildId"))
 
     def delete_build(self):
-        build_id = self._lookup_build_id(self.backend_config["build_name"])
-        while build_id:
+        for build_id in self._lookup_build_ids(self.backend_config.build_name):
             log_info(f"deleting build {build_id}")
             self.gamelift_client.delete_build(BuildId=build_id)
-            build_id = self._lookup_build_id(self.backend_config["build_name"])
+        self._clear_lookup("_lookup_build_id")
 
+    @cached_lookup
     def _lookup_fleet_id(self, fleet_name):
-        response = self.gamelift_client.describe_fleet_attributes()
-        fleet_attributes = response["FleetAttributes"]
-        for fleet in fleet_attributes:
-            if fleet["Name"] == fleet_name:
-                fleet_id = fleet["FleetId"]
-                return fleet_id
-        return None
+        paginator = self.gamelift_client.get_paginator('describe_fleet_attributes')
+        return next(
+            paginator.paginate().search(
+                f"FleetAttributes[?Name=={jmespath_literal(fleet_name)}].FleetId"),
+            None)
+
+    # gamelift has no boto3 waiter for builds, so poll describe_build with
+    # backoff_delays() instead
+    def _wait_for_build_ready(self, build_id):
+        '''returns True once the build is READY, False if it FAILED'''
+        for delay in backoff_delays():
+            describe_build_resp = self.gamelift_client.describe_build(BuildId=build_id)
+            status = describe_build_resp["Build"]["Status"]
+            if status == "READY":
+                return True
+            if status == "FAILED":
+                return False
+            log_info(f"waiting {delay:.1f}s for build to be ready (status {status})")
+            time.sleep(delay)
 
     def create_fleet(self):
         log_info("creating fleet")
-        build_id = self._lookup_build_id(self.backend_config["build_name"])
+        build_id = self._lookup_build_id(self.backend_config.build_name)
 
         # handle the case where the build is so new, that it isn't not be ready to be used in a fleet
         if build_id:
-            describe_build_resp = self.gamelift_client.describe_build(BuildId=build_id)
-            while describe_build_resp["Build"]["Status"] != "READY":
-                log_info("waiting for build to be ready\n")
-                time.sleep(1)
-                describe_build_resp = self.gamelift_client.describe_build(
-                    BuildId=build_id)
+            if not self._wait_for_build_ready(build_id):
+                log_error(f"build {build_id} failed to become ready")
+                return
 
             try:
                 create_fleet_resp = self.gamelift_client.create_fleet(
-                    Name=self.backend_config["fleet_name"],
+                    Name=self.backend_config.fleet_name,
                     BuildId=build_id,
-                    ServerLaunchPath=self.backend_config["fleet_launch_path"],
-                    EC2InstanceType=self.backend_config["fleet_ec2_instance_type"],
+                    ServerLaunchPath=self.backend_config.fleet_launch_path,
+                    EC2InstanceType=self.backend_config.fleet_ec2_instance_type,
                     FleetType="ON_DEMAND",
                     EC2InboundPermissions=[
                     {
@@ -170,57 +362,68 @@ class AwsBackend:
                         'ToPort': 7777,
                         'Protocol': 'UDP',
                         'IpRange': '0.0.0.0/0'}])
+                self._clear_lookup("_lookup_fleet_id")
             except self.gamelift_client.exceptions.LimitExceededException as e:
                 log_error(e)
                 log_error(' * if the limit is the instance types: then try again later; try a different region; or try specifying a different instance type (e.g. use --fleet_ec2_instance_type)')
                 log_error(' * if limit is fleet limit: delete the existing fleet.')
         else:
-            log_error(f'could not find build: {self.backend_config["build_name"]}')
+            log_error(f'could not find build: {self.backend_config.build_name}')
 
     def delete_fleet(self):
-        fleet_id = self._lookup_fleet_id(self.backend_config["fleet_name"])
+        from botocore.exceptions import ClientError
+        fleet_id = self._lookup_fleet_id(self.backend_config.fleet_name)
         if fleet_id:
             try:
                 log_info(f"deleting fleet {fleet_id}")
                 self.gamelift_client.delete_fleet(FleetId=fleet_id)
+                self._clear_lookup("_lookup_fleet_id")
             except ClientError as e:
                 log_warn(e)
 
+    @cached_lookup
     def _lookup_user_pool_id(self, pool_name):
-        response = self.cognitoidp_client.list_user_pools(MaxResults=60)
-        for pool in response["UserPools"]:
-            if pool["Name"] == pool_name:
-                pool_id = pool["Id"]
-                return pool_id
+        paginator = self.cognitoidp_client.get_paginator('list_user_pools')
+        for page in paginator.paginate(PaginationConfig={'PageSize': 60}):
+            for pool in page["UserPools"]:
+                if pool["Name"] == pool_name:
+                    pool_id = pool["Id"]
+                    return pool_id
         return None
 
+    # the arn follows from the pool id, so there is no need to describe the pool
+    @cached_lookup
     def _lookup_user_pool_arn(self,pool_name):
         pool_id = self._lookup_user_pool_id(pool_name)
-        response = self.cognitoidp_client.describe_user_pool(UserPoolId=pool_id)
-        arn = response["UserPool"]["Arn"]
-        return arn
+        if pool_id is None:
+            return None
+        return \
+            f'arn:aws:cognito-idp:{self.cognitoidp_client.meta.region_name}:' \
+            f'{self._lookup_account_id()}:userpool/{pool_id}'
 
+    @cached_lookup
     def _lookup_user_pool_client_id(self, pool_name, client_name):
         pool_id = self._lookup_user_pool_id(pool_name)
         if pool_id:
-            response = self.cognitoidp_client.list_user_pool_clients(
-                UserPoolId=pool_id,
-                MaxResults=60)
-            for client in response["UserPoolClients"]:
-                if client["ClientName"] == client_name:
-                    client_id = client["ClientId"]
-                    return client_id
+            paginator = self.cognitoidp_client.get_paginator('list_user_pool_clients')
+            for page in paginator.paginate(
+                    UserPoolId=pool_id,
+                    PaginationConfig={'PageSize': 60}):
+                for client in page["UserPoolClients"]:
+                    if client["ClientName"] == client_name:
+                        client_id = client["ClientId"]
+                        return client_id
         return None
 
     def create_user_pool(self):
         log_info("creating cognito user pool")
 
-        if self._lookup_user_pool_id(self.backend_config["user_pool_name"]):
+        if self._lookup_user_pool_id(self.backend_config.user_pool_name):
             log_warn("not creating - user pool already exists\n")
             return
 
         create_user_pool_resp = self.cognitoidp_client.create_user_pool(
-            PoolName=self.backend_config["user_pool_name"],
+            PoolName=self.backend_config.user_pool_name,
             Policies={
                 "PasswordPolicy": {
                     "MinimumLength": 6,
@@ -241,6 +444,11 @@ class AwsBackend:
                  }}]
         )
         user_pool_id = create_user_pool_resp["UserPool"]["Id"]
+        self._clear_lookup("_lookup_user_pool_arn")
+        self._remember_lookup(
+            user_pool_id,
+            "_lookup_user_pool_id",
+            self.backend_config.user_pool_name)
 
         log_info("creating cognito app client")
         # ref: https://youtu.be/EfIuC5-wdeo?t=137
@@ -255,7 +463,7 @@ class AwsBackend:
         redirect_uri = "https://aws.amazon.com"
         create_user_pool_client_resp = self.cognitoidp_client.create_user_pool_client(
             UserPoolId=user_pool_id,
-            ClientName=self.backend_config["user_pool_login_client_name"],
+            ClientName=self.backend_config.user_pool_login_client_name,
             GenerateSecret=False,
             ExplicitAuthFlows=[
                 "ALLOW_USER_PASSWORD_AUTH",
@@ -269,49 +477,61 @@ class AwsBackend:
                 "email",
                 "openid"],
         )
-        log_debug(f"create_user_pool_client_resp {create_user_pool_client_resp}")
+        log_debug("create_user_pool_client_resp %s", create_user_pool_client_resp)
+        self._remember_lookup(
+            create_user_pool_client_resp["UserPoolClient"]["ClientId"],
+            "_lookup_user_pool_client_id",
+            self.backend_config.user_pool_name,
+            self.backend_config.user_pool_login_client_name)
 
         update_user_pool_resp = self.cognitoidp_client.update_user_pool(
             UserPoolId=user_pool_id,
             AutoVerifiedAttributes=["email"])
-        log_debug(f"update_user_pool_resp {update_user_pool_resp}")
+        log_debug("update_user_pool_resp %s", update_user_pool_resp)
 
         log_info("creating cognito user pool domain")
         # go to App client settings, setup the callback URLs and hosted UI
-        subdomain = self.backend_config["user_pool_subdomain_prefix"]
+        subdomain = self.backend_config.user_pool_subdomain_prefix
         create_user_pool_resp = self.cognitoidp_client.create_user_pool_domain(
             Domain=subdomain,
             UserPoolId=user_pool_id)
 
         log_info("users can create new accounts using the ui at:")
-        login_url = f'https://{subdomain}.auth.{self.backend_config["region_name"]}.amazoncognito.com/'
+        login_url = f'https://{subdomain}.auth.{self.backend_config.region_name}.amazoncognito.com/'
         login_url = login_url + \
             f'login?client_id={create_user_pool_client_resp["UserPoolClient"]["ClientId"]}'
         login_url = login_url + \
             f'&response_type=Token&scope=email+openid&redirect_uri={redirect_uri}'
         log_info(login_url)
 
+        # cognito admin apis are throttled per pool, so cap the concurrency.
+        # botocore retries TooManyRequestsException with backoff.
         log_info("creating test users")
-        for index in range(32):
-            user_name = 'user' + str(index)
-            self.cognitoidp_client.admin_create_user(
-                UserPoolId=user_pool_id,
-                Username=user_name,
-                UserAttributes=[
-                    {"Name": "email", "Value": "test@test.com"}
-                ],
-                TemporaryPassword="test12",
-                MessageAction='SUPPRESS'
-            )
-            self.cognitoidp_client.admin_set_user_password(
-                UserPoolId=user_pool_id,
-                Username=user_name,
-                Password="test12",
-                Permanent=True
-            )
+        with ThreadPoolExecutor(max_workers=10) as executor:
+            list(executor.map(
+                lambda index: self._create_test_user(user_pool_id, index),
+                range(32)))
+
+    def _create_test_user(self, user_pool_id, index):
+        user_name = 'user' + str(index)
+        self.cognitoidp_client.admin_create_user(
+            UserPoolId=user_pool_id,
+            Username=user_name,
+            UserAttributes=[
+                {"Name": "email", "Value": "test@test.com"}
+            ],
+            TemporaryPassword="test12",
+            MessageAction='SUPPRESS'
+        )
+        self.cognitoidp_client.admin_set_user_password(
+            UserPoolId=user_pool_id,
+            Username=user_name,
+            Password="test12",
+            Permanent=True
+        )
 
     def delete_user_pool(self):
-        pool_id = self._lookup_user_pool_id(self.backend_config["user_pool_name"])
+        pool_id = self._lookup_user_pool_id(self.backend_config.user_pool_name)
         if pool_id:
             response = self.cognitoidp_client.describe_user_pool(UserPoolId=pool_id)
             if "Domain" in response["UserPool"]:
@@ -320,22 +540,63 @@ class AwsBackend:
                 response = self.cognitoidp_client.delete_user_pool_domain(
                     Domain=pool_domain, UserPoolId=pool_id)
             response = self.cognitoidp_client.delete_user_pool(UserPoolId=pool_id)
+            self._clear_lookup(
+                "_lookup_user_pool_id",
+                "_lookup_user_pool_arn",
+                "_lookup_user_pool_client_id")
 
+    @cached_lookup
     def _lookup_lambda_function_arn(self, lambda_name):
         try:
             get_function_resp = self.lambda_client.get_function(
                 FunctionName=lambda_name)
             lambda_arn = get_function_resp["Configuration"]["FunctionArn"]
             return lambda_arn
-        except ClientError:
+        except self.lambda_client.exceptions.ResourceNotFoundException:
             return None
 
+    # one paginated get_account_authorization_details walk returns every role
+    # in the account, so role lookups don't need a get_role call each. the
+    # snapshot is kept up to date as roles are created and deleted. returns
+    # None if the profile isn't allowed iam:GetAccountAuthorizationDetails,
+    # in which case roles are looked up one at a time with get_role.
+    def _get_role_arns(self):
+        from botocore.exceptions import ClientError
+        with self._role_arns_lock:
+            if self._role_arns is None and not self._role_arns_denied:
+                paginator = self.iam_client.get_paginator(
+                    'get_account_authorization_details')
+                try:
+                    self._role_arns = {
+                        role["RoleName"]: role["Arn"]
+                        for page in paginator.paginate(Filter=['Role'])
+                        for role in page["RoleDetailList"]}
+                except ClientError as e:
+                    if e.response["Error"]["Code"] != "AccessDenied":
+                        raise
+                    log_debug("no iam:GetAccountAuthorizationDetails permission, using iam:GetRole")
+                    self._role_arns_denied = True
+            return self._role_arns
+
+    # keep the role snapshot, if there is one, in step with a created
+    # (role_arn) or deleted (None) role
+    def _update_role_arns(self, role_name, role_arn):
+        role_arns = self._get_role_arns()
+        if role_arns is None:
+            return
+        if role_arn:
+            role_arns[role_name] = role_arn
+        else:
+            role_arns.pop(role_name, None)
+
     def _lookup_role_arn(self, role_name):
+        role_arns = self._get_role_arns()
+        if role_arns is not None:
+            return role_arns.get(role_name)
         try:
             response = self.iam_client.get_role(RoleName=role_name)
-            role_arn = response["Role"]["Arn"]
-            return role_arn
-        except ClientError:
+            return response["Role"]["Arn"]
+        except self.iam_client.exceptions.NoSuchEntityException:
             return None
 
     #
@@ -344,10 +605,10 @@ class AwsBackend:
     def _create_lambda_role(
         self,
         role_name,
-        assume_role_policy,
+        assume_role_policy_document,
         other_policy_name,
-        other_policy_json):
-        '''returns role_arn of the newly created role'''
+        other_policy_document):
+        '''returns role_arn of the newly created role. policies are json strings'''
         role_arn = self._lookup_role_arn(role_name)
         if role_arn != None:
             log_warn('role already exists arn ' + role_arn)
@@ -355,14 +616,15 @@ class AwsBackend:
             log_debug('role does not exist: creating')
             response = self.iam_client.create_role(
                 RoleName=role_name,
-                AssumeRolePolicyDocument=json.dumps(assume_role_policy))
+                AssumeRolePolicyDocument=assume_role_policy_document)
             role_arn = response["Role"]["Arn"]
+            self._update_role_arns(role_name, role_arn)
             log_debug(response)
 
         response = self.iam_client.put_role_policy(
             RoleName=role_name,
             PolicyName=other_policy_name,
-            PolicyDocument=json.dumps(other_policy_json))
+            PolicyDocument=other_policy_document)
 
         return role_arn
 
@@ -374,23 +636,26 @@ class AwsBackend:
         replace_old=None,
         replace_new=None):
 
-        with open(filename, 'r') as inputfile:
-            filedata = inputfile.read()
+        filedata = read_handler_template(filename)
 
         # apply string substitutions 
         if replace_old:
-            filedata = filedata.replace(replace_old, replace_new)
+            filedata = filedata.replace(
+                replace_old.encode('utf-8'),
+                replace_new.encode('utf-8'))
 
         # to upload, need it to be in zip format
-        zip_buffer = io.BytesIO()
-        with zipfile.ZipFile(zip_buffer, 'a', zipfile.ZIP_DEFLATED, False) as tempzip:
-            tempzip.writestr('handler.py', filedata)
-        zipped_code = zip_buffer.getvalue()
+        zipped_code = zip_lambda_handler(filedata)
 
+        # throttling and transient errors are retried by botocore (see
+        # make_client_config). the one error retried here is lambda rejecting
+        # a role that is too new to have propagated yet. delays are capped at
+        # 5s so the attempts span about 35s in all.
         log_info(f"creating {function_name} lambda")
         success = False
-        for create_attempt in range(10):
-            try: 
+        create_attempts = 10
+        for create_attempt, delay in zip(range(create_attempts), backoff_delays(cap=5)):
+            try:
                 create_function_response = self.lambda_client.create_function(
                     FunctionName=function_name,
                     Runtime="python3.9",
@@ -401,72 +666,87 @@ class AwsBackend:
                     Handler="handler.lambda_handler"
                 )
                 success = True
-                log_debug(f"create_function_response {create_function_response}")
+                self._clear_lookup("_lookup_lambda_function_arn")
+                log_debug("create_function_response %s", create_function_response)
                 break
-            except ClientError as e:
+            except self.lambda_client.exceptions.ResourceConflictException as e:
+                log_warn(e)
+                log_warn(f"not creating - {function_name} lambda already exists")
+                return
+            except self.lambda_client.exceptions.InvalidParameterValueException as e:
                 log_warn(e)
-                log_warn(f"create attempt {create_attempt} failed - sometimes InvalidParameterException is returned if the role is too new - sleeping and trying again")
-                time.sleep(3)
+                if create_attempt + 1 < create_attempts:
+                    log_warn(f"create attempt {create_attempt} failed - sometimes InvalidParameterValueException is returned if the role is too new - sleeping and trying again")
+                    time.sleep(delay)
         if success:
             log_info(f"success after {create_attempt+1} attempts")
+        else:
+            log_error(f"failed to create {function_name} lambda")
 
 
-    def _create_lambda_roles_and_function(self, 
-            role_name, 
-            other_policy_name,
-            other_policy_json,
-            function_name,
-            filename,
-            replace_old,
-            replace_new):
-
+    def _create_lambda_roles_and_function(self, lambda_spec):
         # setup the role: able to lambda and able to the other policy 
         role_arn = self._create_lambda_role(
-            role_name,
-            can_execute_lambda_policy_json,
-            other_policy_name,
-            other_policy_json)
+            lambda_spec.role_name,
+            can_execute_lambda_policy_document,
+            lambda_spec.other_policy_name,
+            lambda_spec.other_policy_document)
 
         self._create_lambda_function_from_file(
-            function_name,
+            lambda_spec.function_name,
             role_arn,
-            filename,
-            replace_old,
-            replace_new)
+            lambda_spec.filename,
+            lambda_spec.replace_old,
+            lambda_spec.replace_new)
 
     # create the login and startsession lambdas
     def create_lambdas(self):
-        # need the client id to string-replace in the login function 
-        cognito_app_client_id = self._lookup_user_pool_client_id(
-            self.backend_config["user_pool_name"],
-            self.backend_config["user_pool_login_client_name"])
-
-        self._create_lambda_roles_and_function(
-            self.backend_config["lambda_login_role_name"],
-            self.backend_config["lambda_login_other_policy_name"],
-            can_cognito_json,
-            self.backend_config["lambda_login_function_name"],
-            "GameLiftUnreal-CognitoLogin.py",
-            "USER_POOL_APP_CLIENT_ID = ''",
-            "USER_POOL_APP_CLIENT_ID = \"" + cognito_app_client_id + "\"")
-
-        # need the fleet id to string-replace in the session function
-        fleet_id = self._lookup_fleet_id(self.backend_config["fleet_name"])
-        log_debug("got fleet_id" + fleet_id)
-
-        self._create_lambda_roles_and_function(
-            self.backend_config["lambda_start_session_role_name"],
-            self.backend_config["lambda_start_session_other_policy_name"],
-            can_gamelift_session_control_policy_json,
-            self.backend_config["lambda_start_session_function_name"],
-            "GameLiftUnreal-StartGameLiftSession.py",
-            'GAMELIFT_FLEET_ID = ""',
-            "GAMELIFT_FLEET_ID = \"" + fleet_id + "\"")
-
-    def _delete_lambda(self, function_name, policy_name, role_name):
+        # need the client id to string-replace in the login function and the
+        # fleet id to string-replace in the session function
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            cognito_app_client_id_future = executor.submit(
+                self._lookup_user_pool_client_id,
+                self.backend_config.user_pool_name,
+                self.backend_config.user_pool_login_client_name)
+            fleet_id_future = executor.submit(
+                self._lookup_fleet_id,
+                self.backend_config.fleet_name)
+        cognito_app_client_id = cognito_app_client_id_future.result()
+        fleet_id = fleet_id_future.result()
+        log_debug("got fleet_id %s", fleet_id)
+
+        lambda_specs = [
+            LambdaSpec(
+                role_name=self.backend_config.lambda_login_role_name,
+                other_policy_name=self.backend_config.lambda_login_other_policy_name,
+                other_policy_document=can_cognito_policy_document,
+                function_name=self.backend_config.lambda_login_function_name,
+                filename="GameLiftUnreal-CognitoLogin.py",
+                replace_old="USER_POOL_APP_CLIENT_ID = ''",
+                replace_new="USER_POOL_APP_CLIENT_ID = \"" + cognito_app_client_id + "\""),
+            LambdaSpec(
+                role_name=self.backend_config.lambda_start_session_role_name,
+                other_policy_name=self.backend_config.lambda_start_session_other_policy_name,
+                other_policy_document=can_gamelift_session_control_policy_document,
+                function_name=self.backend_config.lambda_start_session_function_name,
+                filename="GameLiftUnreal-StartGameLiftSession.py",
+                replace_old='GAMELIFT_FLEET_ID = ""',
+                replace_new="GAMELIFT_FLEET_ID = \"" + fleet_id + "\"")]
+
+        # the lambdas and their roles are independent, so create them
+        # concurrently. boto3 clients are thread-safe for method calls.
+        with ThreadPoolExecutor(max_workers=len(lambda_specs)) as executor:
+            list(executor.map(self._create_lambda_roles_and_function, lambda_specs))
+
+    def _delete_lambda_function(self, function_name):
         function_arn = self._lookup_lambda_function_arn(function_name)
         if function_arn: 
             self.lambda_client.delete_function(FunctionName=function_name)
+            self._clear_lookup("_lookup_lambda_function_arn")
+
+    # the inline policy has to be removed before the role can be deleted
+    def _delete_lambda_role(self, policy_name, role_name):
+        from botocore.exceptions import ClientError
         try:
             response = self.iam_client.delete_role_policy(RoleName=role_name, PolicyName=policy_name)
         except ClientError as e:
@@ -476,102 +756,69 @@ class AwsBackend:
         role_arn = self._lookup_role_arn(role_name)
         if role_arn:
             self.iam_client.delete_role(RoleName=role_name)
+            self._update_role_arns(role_name, None)
 
+    # the function and its role don't depend on each other, so delete both at once
+    def _delete_lambda(self, function_name, policy_name, role_name):
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            futures = [
+                executor.submit(self._delete_lambda_function, function_name),
+                executor.submit(self._delete_lambda_role, policy_name, role_name)]
+        for future in futures:
+            future.result()
 
     def delete_lambdas(self):
         log_info("deleting lambdas")
-        self._delete_lambda(
-            self.backend_config["lambda_start_session_function_name"],
-            self.backend_config["lambda_start_session_other_policy_name"],
-            self.backend_config["lambda_start_session_role_name"])
-        self._delete_lambda(
-            self.backend_config["lambda_login_function_name"],
-            self.backend_config["lambda_login_other_policy_name"],
-            self.backend_config["lambda_login_role_name"])
-
-    # create the resource for the API gateway and bind it to the corresponding lambda
-    def _create_rest_resource(
-        self,
-        rest_api_id,
-        apigateway_client, path_part, http_method,
-        account_id, lambda_function_arn,
-        authorizer_id):
-
-        # get Root ID
-        try:
-            response = self.apigateway_client.get_resources(restApiId=rest_api_id)
-            root_id = next(item['id']
-                        for item in response['items'] if item['path'] == '/')
-        except ClientError:
-            log_exception(
-                "Couldn't get the ID of the root resource of the REST API.")
-            raise
-
-        # create the resource under root
-        try:
-            response = self.apigateway_client.create_resource(
-                restApiId=rest_api_id, parentId=root_id, pathPart=path_part)
-            resource_id = response['id']
-        except ClientError:
-            log_exception("Couldn't create pathPart path for %s.", path_part)
-            raise
-
-        #
-        # Create the method for the resource
-        #
-        # ref: https://youtu.be/EfIuC5-wdeo?t=1095
-        #      * shows setting the Authorizor on the method
-    
-        if authorizer_id:
-            authorization_type = 'COGNITO_USER_POOLS'
-        else:
-            authorization_type = 'NONE'
-            authorizer_id = ''
-    
-        try:
-            self.apigateway_client.put_method(
-                restApiId=rest_api_id,
-                resourceId=resource_id,
-                httpMethod=http_method,
-                authorizationType=authorization_type,
-                authorizerId=authorizer_id)
-        except ClientError:
-            log_exception("Couldn't create a method for the base resource.")
-            raise
-
-        #
-        # Bind the method to the lambda
-        #
-        lambda_uri = \
-            f'arn:aws:apigateway:{self.apigateway_client.meta.region_name}:' \
-            f'lambda:path/2015-03-31/functions/{lambda_function_arn}/invocations'
-        log_debug(lambda_uri)  
-        try:
-            # NOTE: You must specify 'POST' for integrationHttpMethod or this will
-            # not work.
-            self.apigateway_client.put_integration(
-                restApiId=rest_api_id,
-                resourceId=resource_id,
-                httpMethod=http_method,
-                type='AWS',
-                integrationHttpMethod='POST',
-                uri=lambda_uri)
-        except ClientError:
-            log_exception(
-                "Couldn't set function %s as integration destination.",
-                lambda_function_arn)
-            raise
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            futures = [
+                executor.submit(
+                    self._delete_lambda,
+                    self.backend_config.lambda_start_session_function_name,
+                    self.backend_config.lambda_start_session_other_policy_name,
+                    self.backend_config.lambda_start_session_role_name),
+                executor.submit(
+                    self._delete_lambda,
+                    self.backend_config.lambda_login_function_name,
+                    self.backend_config.lambda_login_other_policy_name,
+                    self.backend_config.lambda_login_role_name)]
+        for future in futures:
+            future.result()
+
+    # openapi "paths" entry for one resource whose http_method invokes a lambda.
+    # the x-amazon-apigateway-* extensions set up what put_method,
+    # put_integration, put_integration_response and put_method_response used to.
+    #
+    # ref: https://docs.aws.amazon.com/apigateway/latest/developerguide/api-gateway-swagger-extensions.html
+    # ref: https://youtu.be/EfIuC5-wdeo?t=1095
+    #      * shows setting the Authorizor on the method
+    def _make_rest_path_spec(self, http_method, lambda_uri, authorizer_name):
+        log_debug(lambda_uri)
+
+        method_spec = {
+            "responses": {
+                "200": {"description": "200 response"}
+            },
+            "x-amazon-apigateway-integration": {
+                "type": "aws",
+                # NOTE: lambdas must be invoked with 'POST' or this will not work.
+                "httpMethod": "POST",
+                "uri": lambda_uri,
+                "responses": {
+                    "default": {"statusCode": "200"}
+                }
+            }
+        }
+        if authorizer_name:
+            method_spec["security"] = [{authorizer_name: []}]
+        return {http_method.lower(): method_spec}
 
-        #
-        # Add permission so the method is able to invoke the lambda
-        #
-        source_arn = \
-            f'arn:aws:execute-api:{apigateway_client.meta.region_name}:' \
-            f'{account_id}:{rest_api_id}/*/*/{path_part}'
+    # add permission so the resource's method is able to invoke the lambda
+    def _add_rest_invoke_permission(self, lambda_function_arn, source_arn):
+        from botocore.exceptions import ClientError
         try:
             self.lambda_client.add_permission(
                 FunctionName=lambda_function_arn,
-                StatementId=uuid.uuid4().hex,  # todo do I need to clean these up
+                StatementId=next_statement_id(),  # todo do I need to clean these up
                 Action='lambda:InvokeFunction', Principal='apigateway.amazonaws.com',
                 SourceArn=source_arn)
         except ClientError:
@@ -580,110 +827,128 @@ class AwsBackend:
                 lambda_function_arn)
             raise
 
-        #
-        # Fill out response details
-        #
-        self.apigateway_client.put_integration_response(
-            restApiId=rest_api_id,
-            resourceId=resource_id,
-            httpMethod=http_method,
-            statusCode="200",
-            selectionPattern=".*"
-        )
-    
-        self.apigateway_client.put_method_response(
-            restApiId=rest_api_id,
-            resourceId=resource_id,
-            httpMethod=http_method,
-            statusCode="200")
-
-    def _create_login_resource(self, rest_api_id, authorizer_id):
-        account_id = self.sts_client.get_caller_identity()["Account"]
-        lambda_name = self.backend_config["lambda_login_function_name"]
-        lambda_arn = self._lookup_lambda_function_arn(lambda_name)
-
-        self._create_rest_resource(
-            rest_api_id,
-            self.apigateway_client,
-            self.backend_config["rest_api_login_path_part"],
-            'POST',
-            account_id,
-            lambda_arn,
-            authorizer_id)
-
-    # the gateway resource to invoke the session labmda
-    def _create_start_session_resource(self, rest_api_id, authorizer_id):
-        account_id = self.sts_client.get_caller_identity()["Account"]
-        lambda_name = self.backend_config["lambda_start_session_function_name"]
-        lambda_arn = self._lookup_lambda_function_arn(lambda_name)
-
-        self._create_rest_resource(
-            rest_api_id,
-            self.apigateway_client,
-            self.backend_config["rest_api_start_session_path_part"],
-            'GET',
-            account_id,
-            lambda_arn,
-            authorizer_id)
-
+    @cached_lookup
     def _lookup_rest_api_id(self, rest_api_name):
-        response = self.apigateway_client.get_rest_apis()
-        rest_apis = response["items"]
-        for rest_api in rest_apis:
-            if rest_api_name == rest_api["name"]:
-                rest_api_id = rest_api["id"]
-                return rest_api_id
-        return None
+        paginator = self.apigateway_client.get_paginator('get_rest_apis')
+        return next(
+            paginator.paginate().search(
+                f"items[?name=={jmespath_literal(rest_api_name)}].id"),
+            None)
 
     # create_rest_api: create the api, authorizer and methods
     #
+    # the whole api is described as one openapi document and imported with a
+    # single import_rest_api call rather than built up resource by resource.
+    #
     # ref: https://youtu.be/EfIuC5-wdeo?t=822
     #      Amazon GameLift-UE4 Episode 6: Amazon Cognito and API Gateway
     #        * has some details on configuring lambda invocation using boto3
     #
     def create_rest_api(self):
-        if self._lookup_rest_api_id(self.backend_config["rest_api_name"]):
+        from botocore.exceptions import ClientError
+        rest_api_name = self.backend_config.rest_api_name
+        if self._lookup_rest_api_id(rest_api_name):
             log_info("not creating rest api because it already exists")
             return
 
+        # resolve everything the authorizer and resources need concurrently
+        # and pass it down, so each value is fetched once
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            cognito_arn_future = executor.submit(
+                self._lookup_user_pool_arn,
+                self.backend_config.user_pool_name)
+            account_id_future = executor.submit(self._lookup_account_id)
+            login_arn_future = executor.submit(
+                self._lookup_lambda_function_arn,
+                self.backend_config.lambda_login_function_name)
+            start_session_arn_future = executor.submit(
+                self._lookup_lambda_function_arn,
+                self.backend_config.lambda_start_session_function_name)
+        cognito_arn = cognito_arn_future.result()
+        account_id = account_id_future.result()
+        login_arn = login_arn_future.result()
+        start_session_arn = start_session_arn_future.result()
+        if not (cognito_arn and login_arn and start_session_arn):
+            log_error("not creating rest api - create the user_pool and lambdas first")
+            return
+
+        login_path_part = self.backend_config.rest_api_login_path_part
+        start_session_path_part = self.backend_config.rest_api_start_session_path_part
+        authorizer_name = self.backend_config.rest_api_cognito_authorizer_name
+
+        # the region and account are the same for every resource, so build the
+        # arn prefixes once and only fill in the per-resource part
+        region = self.apigateway_client.meta.region_name
+        lambda_uri_template = \
+            f'arn:aws:apigateway:{region}:' \
+            'lambda:path/2015-03-31/functions/{lambda_function_arn}/invocations'
+
+        # login is open, start session requires the cognito authorizer
+        # ref: https://youtu.be/EfIuC5-wdeo?t=1012
+        rest_api_spec = {
+            "openapi": "3.0.1",
+            "info": {
+                "title": rest_api_name,
+                "version": "1.0"
+            },
+            "paths": {
+                "/" + login_path_part: self._make_rest_path_spec(
+                    'POST',
+                    lambda_uri_template.format(lambda_function_arn=login_arn),
+                    None),
+                "/" + start_session_path_part: self._make_rest_path_spec(
+                    'GET',
+                    lambda_uri_template.format(lambda_function_arn=start_session_arn),
+                    authorizer_name)
+            },
+            "components": {
+                "securitySchemes": {
+                    authorizer_name: {
+                        "type": "apiKey",
+                        "name": "Authorization",
+                        "in": "header",
+                        "x-amazon-apigateway-authtype": "cognito_user_pools",
+                        "x-amazon-apigateway-authorizer": {
+                            "type": "cognito_user_pools",
+                            "providerARNs": [cognito_arn]
+                        }
+                    }
+                }
+            }
+        }
+
         # create the rest API
         try:
-            response = self.apigateway_client.create_rest_api(
-                name=self.backend_config["rest_api_name"])
+            response = self.apigateway_client.import_rest_api(
+                failOnWarnings=True,
+                body=json.dumps(rest_api_spec))
             rest_api_id = response['id']
+            self._clear_lookup("_lookup_rest_api_id")
         except ClientError:
-            log_exception(
-                f'Could not create REST API {self.backend_config["rest_api_name"]}.')
+            log_exception(f'Could not create REST API {rest_api_name}.')
             raise
 
-        # create the cognito authorizer
-        cognito_arn = self._lookup_user_pool_arn(self.backend_config["user_pool_name"])
-
-        # ref: https://youtu.be/EfIuC5-wdeo?t=1012
-        create_authorizer_response = self.apigateway_client.create_authorizer(
-            restApiId=rest_api_id,
-            name=self.backend_config["rest_api_cognito_authorizer_name"],
-            type='COGNITO_USER_POOLS',
-            providerARNs=[cognito_arn],
-            identitySource="method.request.header.Authorization"
-        )
-        authorizer_id = create_authorizer_response["id"]
-
-        # create the login and start session gateway
-        self._create_login_resource(rest_api_id, None)
-        self._create_start_session_resource(rest_api_id, authorizer_id)
+        source_arn_template = \
+            f'arn:aws:execute-api:{region}:{account_id}:{rest_api_id}/*/*/' \
+            '{path_part}'
+        self._add_rest_invoke_permission(
+            login_arn,
+            source_arn_template.format(path_part=login_path_part))
+        self._add_rest_invoke_permission(
+            start_session_arn,
+            source_arn_template.format(path_part=start_session_path_part))
 
         # deploy the API to the requested stage name
         try:
             create_deployment_resp = self.apigateway_client.create_deployment(
                 restApiId=rest_api_id,
-                stageName=self.backend_config["rest_api_stage_name"])
-            log_debug(f"create_deployment_resp {create_deployment_resp}")
+                stageName=self.backend_config.rest_api_stage_name)
+            log_debug("create_deployment_resp %s", create_deployment_resp)
         except ClientError:
             log_exception("Couldn't deploy REST API %s.", rest_api_id)
             raise
 
-        invoke_url = f'https://{rest_api_id}.execute-api.{self.backend_config["region_name"]}.amazonaws.com/{self.backend_config["rest_api_stage_name"]}'
+        invoke_url = f'https://{rest_api_id}.execute-api.{self.backend_config.region_name}.amazonaws.com/{self.backend_config.rest_api_stage_name}'
         log_info('invoke_url: ' + invoke_url)
         log_info('to login try:')
         login_curl = 'curl -X POST -d "{\\"username\\":\\"user0\\", \\"password\\":\\"test12\\"}" ' + \
@@ -697,78 +962,104 @@ class AwsBackend:
 
     def delete_rest_api(self):
         log_info("deleting rest_api")
-        rest_api_id = self._lookup_rest_api_id(self.backend_config["rest_api_name"])
+        rest_api_id = self._lookup_rest_api_id(self.backend_config.rest_api_name)
         while rest_api_id:
             self.apigateway_client.delete_rest_api(restApiId=rest_api_id)
-            rest_api_id = self._lookup_rest_api_id(self.backend_config["rest_api_name"])
-
-
+            self._clear_lookup("_lookup_rest_api_id")
+            rest_api_id = self._lookup_rest_api_id(self.backend_config.rest_api_name)
+
+
+# the create commands that must finish before a create command may start.
+# listed in an order where every command comes after its dependencies.
+create_dependencies = {
+    "build": [],
+    "fleet": ["build"],
+    "user_pool": [],
+    "lambdas": ["fleet", "user_pool"],
+    "rest_api": ["lambdas", "user_pool"],
+}
+
+
+# what each command does, as AwsBackend methods
+create_actions = {
+    "build": AwsBackend.create_build,
+    "fleet": AwsBackend.create_fleet,
+    "user_pool": AwsBackend.create_user_pool,
+    "lambdas": AwsBackend.create_lambdas,
+    "rest_api": AwsBackend.create_rest_api,
+}
+
+delete_actions = {
+    "build": AwsBackend.delete_build,
+    "fleet": AwsBackend.delete_fleet,
+    "user_pool": AwsBackend.delete_user_pool,
+    "lambdas": AwsBackend.delete_lambdas,
+    "rest_api": AwsBackend.delete_rest_api,
+}
+
+
+def run_after(futures, action, *args):
+    for future in futures:
+        future.result()
+    return action(*args)
+
+
+# commands start as soon as the requested commands they depend on are done,
+# so e.g. build and user_pool are created at the same time
 def process_create_commands(backend, commands):
-    while len(commands) > 0:
-        command = commands.pop(0)
-        if command == "build":
-            backend.create_build()
-        elif command == "fleet":
-            backend.create_fleet()
-        elif command == "user_pool":
-            backend.create_user_pool()
-        elif command == "lambdas":
-            backend.create_lambdas()
-        elif command == "rest_api":
-            backend.create_rest_api()
-        else:
-            log_warn("urecognized command" + command)
+    futures = {}
+    with ThreadPoolExecutor(max_workers=len(create_actions)) as executor:
+        for command, dependencies in create_dependencies.items():
+            if command in commands:
+                futures[command] = executor.submit(
+                    run_after,
+                    [futures[d] for d in dependencies if d in futures],
+                    create_actions[command],
+                    backend)
+    for future in futures.values():
+        future.result()
+
+
+# each resource is deleted independently of the others, so run them all at once
+def process_delete_commands(backend, commands):
+    futures = {}
+    with ThreadPoolExecutor(max_workers=len(delete_actions)) as executor:
+        for command in commands:
+            if command not in futures:
+                futures[command] = executor.submit(delete_actions[command], backend)
+    for future in futures.values():
+        future.result()
 
 
-def process_delete_commands(backend, commands):
-    while len(commands) > 0:
-        command = commands.pop(0)
-        if command == "build":
-            backend.delete_build()
-        elif command == "fleet":
-            backend.delete_fleet()
-        elif command == "user_pool":
-            backend.delete_user_pool()
-        elif command == "lambdas":
-            backend.delete_lambdas()
-        elif command == "rest_api":
-            backend.delete_rest_api()
-        else:
-            log_warn("urecognized command" + command)
+# the resources that can be named on the command line
+resource_choices = list(create_dependencies) + ["all"]
 
+action_dispatch = {
+    "create": process_create_commands,
+    "delete": process_delete_commands,
+}
 
-def process_backend_config(backend_config):
-    if len(backend_config["commands"]) > 0:
-        log_info(f'using AWS profile: {backend_config["profile_name"]}')
-        a = AwsBackend(backend_config)
 
-        main_command = backend_config["commands"].pop(0)
-        sub_commands = backend_config["commands"]
+# the resources named on the command line, with "all" expanded
+def requested_resources(backend_config):
+    if "all" in backend_config.resources:
+        return list(create_dependencies)
+    return list(dict.fromkeys(backend_config.resources))
 
-        if len(sub_commands) > 0 and sub_commands[0] == "all":
-            sub_commands = [
-                "build",
-                "fleet",
-                "user_pool",
-                "lambdas",
-                "rest_api"]
 
-        if main_command == "create":
-            process_create_commands(a, sub_commands)
-        elif main_command == "delete":
-            process_delete_commands(a, sub_commands)
-        else:
-            log_warn(f"unrecognized_command: {main_command}")
+def process_backend_config(backend_config, session):
+    process_commands = action_dispatch[backend_config.action]
+    resources = requested_resources(backend_config)
+
+    a = AwsBackend(backend_config, session)
+    process_commands(a, resources)
 
 
 class Formatter(argparse.ArgumentDefaultsHelpFormatter, argparse.RawDescriptionHelpFormatter):
     pass
 
 
-def make_backend_config_from_args(argv):
-    '''return a backend_config'''
-
-    example_text = '''create examples:
+example_text = '''create examples:
        python aws_backend.py create build
        python aws_backend.py create fleet
        python aws_backend.py create user_pool
@@ -779,140 +1070,184 @@ delete examples:
        python aws_backend.py delete build
        python aws_backend.py delete all
 
+dry run example:
+       python aws_backend.py --dry_run create all
+
 override default example:
        python aws_backend.py --prefix=potato --build_root=E:/unreal_projects/ue5_gamelift_plugin_test/MyProject/ServerBuild/WindowsServer -- fleet_launch_path=C:/game/MyProject/Binaries/Win64/MyProjectServer.exe --profile=dave --region=us-west-2
        '''
 
+default_prefix = "test1"
+
+# finds --prefix ahead of the full parse, which needs it for its defaults
+prefix_parser = argparse.ArgumentParser(add_help=False)
+prefix_parser.add_argument('--prefix', default=default_prefix)
+
+
+# the options that make up the rest of the configuration, as
+# (option, default, help). options whose default is a name built from
+# {prefix} also have {prefix} (or [prefix]) filled into a value given on the
+# command line. paths, the profile and the region are taken as typed.
+config_options = (
+    ("--build_name", "{prefix}-build",
+     "name associated with the build (visible in the GameLift console"),
+    ("--build_version", "build0.42",
+     "a version number"),
+    ("--build_os", "WINDOWS_2012",
+     "the os to install on the EC2 instances"),
+    ("--build_root", "E:/unreal_projects/MyProject/x64 Builds/WindowsServer",
+     "path to the server package on your local machine"),
+
+    ("--fleet_name", "{prefix}-fleet",
+     "name associated with the fleet"),
+    ("--fleet_launch_path", "C:/game/MyProject/Binaries/Win64/MyProjectServer.exe",
+     "the EC2 path to the server.  Must start with c:/game"),
+
+    ("--fleet_ec2_instance_type", "c5.large",
+     "what kind of EC2s to allocate.  Currently c5.large, c4.large and c3.large qualify for the GameLift free tier"),
+
+    ("--user_pool_name", "{prefix}-user-pool",
+     "pool name"),
+    ("--user_pool_login_client_name", "{prefix}-user-pool-login-client",
+     "pool client name"),
+    ("--user_pool_subdomain_prefix", "{prefix}-login",
+     "name the subdomain"),
+
+    ("--lambda_login_function_name", "{prefix}-lambda-login-function",
+     "name of the login lamda function"),
+    ("--lambda_login_role_name", "{prefix}-lambda-login-role",
+     "name of the role used by the login lamda"),
+    ("--lambda_login_other_policy_name", "{prefix}-lambda-login-other-policy-name",
+     "name of specific policies that lets login work (i.e. cognito policies)"),
+
+    ("--lambda_start_session_function_name", "{prefix}-lambda-start-session-function",
+     "name of the start-session lambda function"),
+    ("--lambda_start_session_role_name", "{prefix}-lambda-start-session-role",
+     "name of the role used by the start-session lambda"),
+    ("--lambda_start_session_other_policy_name", "{prefix}-lambda-start-session-other-policy-name",
+     "name of specific policies that lets start-session work (i.e. gamelift policies)"),
+
+    ("--rest_api_name", "{prefix}-rest-api",
+     "name the api"),
+    ("--rest_api_stage_name", "{prefix}-api-test-stage",
+     "name the stage"),
+    ("--rest_api_login_path_part", "login",
+     "name the suffix"),
+    ("--rest_api_start_session_path_part", "startsession",
+     "name the suffix"),
+    ("--rest_api_cognito_authorizer_name", "{prefix}-cognito-authorizer",
+     "name the authorizer"),
+
+    ("--profile_name", "sean_backend",
+     "AWS credentials to use"),
+    ("--region_name", "us-west-2",
+     "AWS region"),
+)
+
+
+# the parsed command line: the action and its resources, --prefix, a field
+# for each of config_options (named like its option, without the dashes) and
+# --dry_run
+BackendConfig = make_dataclass(
+    "BackendConfig",
+    [("action", str), ("resources", tuple), ("prefix", str)]
+    + [(option[2:], str) for option, _, _ in config_options]
+    + [("dry_run", bool)],
+    frozen=True)
+
+
+# the parser is the same for every call with the same prefix, so build it once
+@functools.lru_cache(maxsize=1)
+def make_argument_parser(prefix):
+    # fill the prefix into a name as argparse converts it, default or not.
+    # these final configuration parameters are what is used as the resource
+    # names during creation and deletion.
+    def fill_prefix(value):
+        return sys.intern(
+            value.replace("{prefix}", prefix).replace("[prefix]", prefix))
+
     parser = argparse.ArgumentParser(
         description='Configure AWS Services to provide login, session and server management for dedicated UE servers',
         epilog=example_text,
         formatter_class=Formatter)
-    parser.add_argument('commands', nargs='*')
-    parser.add_argument('--prefix', default="test1", help="prefix used below")
-
-    parser.add_argument(
-        '--build_name',
-        default="[prefix]-build",
-        help="name associated with the build (visible in the GameLift console")
-    parser.add_argument(
-        '--build_version',
-        default="build0.42",
-        help="a version number")
-    parser.add_argument(
-        '--build_os',
-        default="WINDOWS_2012",
-        help="the os to install on the EC2 instances")
-    parser.add_argument(
-        '--build_root',
-        default="E:/unreal_projects/MyProject/x64 Builds/WindowsServer",
-        help="path to the server package on your local machine")
-
-    parser.add_argument(
-        '--fleet_name',
-        default="[prefix]-fleet",
-        help="name associated with the fleet")
-    parser.add_argument(
-        '--fleet_launch_path',
-        default="C:/game/MyProject/Binaries/Win64/MyProjectServer.exe",
-        help="the EC2 path to the server.  Must start with c:/game")
-
-    parser.add_argument(
-        '--fleet_ec2_instance_type',
-        default="c5.large",
-        help="what kind of EC2s to allocate.  Currently c5.large, c4.large and c3.large qualify for the GameLift free tier")
-
-    parser.add_argument(
-        '--user_pool_name',
-        default="[prefix]-user-pool",
-        help="pool name")
+    # the positionals have no meaningful default to show in --help, so their
+    # defaults come from the namespace passed to parse_args instead. choices
+    # are checked after parsing: before python 3.12 argparse checks an absent
+    # positional's default against choices and rejects it.
     parser.add_argument(
-        '--user_pool_login_client_name',
-        default="[prefix]-user-pool-login-client",
-        help="pool client name")
+        'action',
+        nargs='?',
+        default=argparse.SUPPRESS,
+        metavar='{' + ",".join(action_dispatch) + '}',
+        help="what to do with the resources")
     parser.add_argument(
-        '--user_pool_subdomain_prefix',
-        default="[prefix]-login",
-        help="name the subdomain")
- 
-    parser.add_argument(
-        '--lambda_login_function_name',
-        default="[prefix]-lambda-login-function",
-        help="name of the login lamda function")
-    parser.add_argument(
-        '--lambda_login_role_name',
-        default="[prefix]-lambda-login-role",
-        help="name of the role used by the login lamda")
-    parser.add_argument(
-        '--lambda_login_other_policy_name',
-        default="[prefix]-lambda-login-other-policy-name",
-        help="name of specific policies that lets login work (i.e. cognito policies)")
-
-    parser.add_argument(
-        '--lambda_start_session_function_name',
-        default="[prefix]-lambda-start-session-function",
-        help="name of the start-session lambda function")
-    parser.add_argument(
-        '--lambda_start_session_role_name',
-        default="[prefix]-lambda-start-session-role",
-        help="name of the role used by the start-session lambda")
-    parser.add_argument(
-        '--lambda_start_session_other_policy_name',
-        default="[prefix]-lambda-start-session-other-policy-name",
-        help="name of specific policies that lets start-session work (i.e. gamelift policies)")
-
-    parser.add_argument(
-        '--rest_api_name',
-        default="[prefix]-rest-api",
-        help="name the api")
-    parser.add_argument(
-        '--rest_api_stage_name',
-        default="[prefix]-api-test-stage",
-        help="name the stage")
-    parser.add_argument(
-        '--rest_api_login_path_part',
-        default="login",
-        help="name the suffix")
-    parser.add_argument(
-        '--rest_api_start_session_path_part',
-        default="startsession",
-        help="name the suffix")
-    parser.add_argument(
-        '--rest_api_cognito_authorizer_name',
-        default="[prefix]-cognito-authorizer",
-        help="name the authorizer")
+        'resources',
+        nargs='*',
+        default=argparse.SUPPRESS,
+        metavar='resource',
+        help="any of: " + ", ".join(resource_choices))
+    parser.add_argument('--prefix', default=default_prefix, help="prefix used below")
+
+    for option, default, help_text in config_options:
+        if "{prefix}" in default:
+            parser.add_argument(option, default=default, type=fill_prefix, help=help_text)
+        else:
+            parser.add_argument(option, default=default, help=help_text)
 
     parser.add_argument(
-        '--profile_name',
-        default='sean_backend',
-        help="AWS credentials to use")
-    parser.add_argument('--region_name',
-            default='us-west-2',
-            help='AWS region')
+        '--dry_run',
+        action='store_true',
+        help="show the configuration and what would be created or deleted, without contacting AWS")
 
-    args = parser.parse_args(argv)
+    return parser
 
-    backend_config = vars(args)
 
-    # walk through the build config and replace [prefix] with the prefix
-    # these final configuration parameters are what is used as the resource
-    # names during creation and deletion.
-    log_debug("Backend Configuration:")
-    prefix = backend_config["prefix"]
-    for key, value in backend_config.items():
-        if type(value) == str:
-            backend_config[key] = value.replace("[prefix]", prefix)
-        log_debug(f"    {key}:{backend_config[key]}")
+def make_backend_config_from_args(argv):
+    '''return a BackendConfig'''
+    prefix_args, _ = prefix_parser.parse_known_args(argv)
+    parser = make_argument_parser(prefix_args.prefix)
+    args = parser.parse_args(argv, argparse.Namespace(action=None, resources=[]))
+    if args.action and args.action not in action_dispatch:
+        parser.error(
+            f"argument action: invalid choice: {args.action!r} "
+            f"(choose from {', '.join(map(repr, action_dispatch))})")
+    for resource in args.resources:
+        if resource not in resource_choices:
+            parser.error(
+                f"argument resource: invalid choice: {resource!r} "
+                f"(choose from {', '.join(map(repr, resource_choices))})")
+    if args.action and not args.resources:
+        parser.error(f"{args.action} needs at least one resource")
+
+    args.resources = tuple(args.resources)
+    backend_config = BackendConfig(**vars(args))
+
+    if logger.isEnabledFor(logging.DEBUG):
+        log_debug("Backend Configuration:\n%s", "\n".join(
+            f"    {key}:{value}" for key, value in asdict(backend_config).items()))
 
     return backend_config
 
 # ref: https://docs.python.org/3/howto/logging-cookbook.html#logging-to-multiple-destinations 
 # python docs on how to send INFO and above to console and DEBUG, INFO and above to logfile 
 def setup_logger():
-    logging.basicConfig(level=logging.DEBUG,
-                    format='%(asctime)s %(name)-12s %(levelname)-8s %(message)s',
-                    datefmt='%m-%d %H:%M',
-                    filename='aws_backend.log',
-                    filemode='w')
+    # none of the formats below use thread, process or caller information,
+    # so skip collecting it for every record
+    logging.logThreads = False
+    logging.logProcesses = False
+    logging.logMultiprocessing = False
+    logging._srcfile = None
+
+    # the file gets DEBUG and above. runs of DEBUG records are buffered and
+    # written out when an INFO or higher arrives, or 1024 at a time, so the
+    # file still follows progress during long waits
+    logfile = logging.FileHandler('aws_backend.log', mode='w')
+    logfile.setFormatter(logging.Formatter(
+        '%(asctime)s %(name)-12s %(levelname)-8s %(message)s',
+        datefmt='%m-%d %H:%M'))
+    buffered_logfile = logging.handlers.MemoryHandler(
+        capacity=1024, flushLevel=logging.INFO, target=logfile)
+
     # define a Handler which writes INFO messages or higher to the sys.stderr
     console = logging.StreamHandler()
     console.setLevel(logging.INFO)
@@ -921,15 +1256,53 @@ def setup_logger():
     formatter = logging.Formatter('%(asctime)s %(levelname)-8s %(message)s')
     # tell the handler to use this format
     console.setFormatter(formatter)
-    # add the handler to the root logger
-    logging.getLogger('').addHandler(console)
 
+    # the root logger only puts records on a queue. the calling thread still
+    # merges the message with its args, but a listener thread lays out the
+    # lines and writes them, so threads making AWS calls don't wait on I/O
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.setFormatter(logging.Formatter('%(message)s'))
+    logging.basicConfig(level=logging.DEBUG, handlers=[queue_handler])
+    listener = logging.handlers.QueueListener(
+        log_queue, buffered_logfile, console, respect_handler_level=True)
+    listener.start()
+    # runs before logging's own shutdown, which then flushes the buffer
+    atexit.register(listener.stop)
+
+
+def log_dry_run(backend_config):
+    log_info("Backend Configuration:\n%s", "\n".join(
+        f"    {key}:{value}" for key, value in asdict(backend_config).items()))
+    if not backend_config.action:
+        return
+
+    resources = requested_resources(backend_config)
+    if backend_config.action == "create":
+        for resource, dependencies in create_dependencies.items():
+            if resource in resources:
+                waits_for = [d for d in dependencies if d in resources]
+                log_info(f"would create {resource}"
+                         + (f" after {', '.join(waits_for)}" if waits_for else ""))
+    else:
+        for resource in resources:
+            log_info(f"would delete {resource}")
 
 
 def run_main(argv):
     setup_logger()
     backend_config = make_backend_config_from_args(argv)
-    process_backend_config(backend_config)
+    if backend_config.dry_run:
+        log_dry_run(backend_config)
+    elif backend_config.action:
+        log_info(f'using AWS profile: {backend_config.profile_name}')
+        # one session, so credentials and config are resolved once and
+        # every client shares the connection settings from make_client_config
+        import boto3
+        session = boto3.Session(
+            profile_name=backend_config.profile_name,
+            region_name=backend_config.region_name)
+        process_backend_config(backend_config, session)
 
 
 if __name__ == '__main__':